@@ -0,0 +1,31 @@
+import json
+from typing import Any
+
+# orjson is several times faster on the large nested pipeline states and cache
+# payloads; the stdlib json module stays as the fallback when it isn't installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(text: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def json_dumps(value: Any, indent: bool = False) -> bytes:
+    """Serialize ``value`` to UTF-8 JSON bytes, optionally indented by two spaces."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_INDENT_2 if indent else None)
+        except TypeError:
+            # orjson rejects non-str keys and lone surrogates (broken PDF fonts).
+            pass
+    text = json.dumps(value, indent=2 if indent else None, ensure_ascii=False)
+    try:
+        return text.encode("utf-8")
+    except UnicodeEncodeError:
+        # Lone surrogates have no UTF-8 form; \u-escaping keeps them losslessly.
+        return json.dumps(value, indent=2 if indent else None).encode("ascii")
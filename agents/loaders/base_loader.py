@@ -1,6 +1,19 @@
+import os
 from abc import ABC, abstractmethod
 
 
+def env_concurrency(name: str) -> int:
+    """Worker count from the ``name`` env var; defaults to the CPU count."""
+    default = os.cpu_count() or 1
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        return default
+
+
 class BaseLoader(ABC):
     @abstractmethod
     def load(self, path: str) -> str:
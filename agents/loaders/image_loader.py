@@ -1,11 +1,15 @@
-from .base_loader import BaseLoader
+import asyncio
+import io
+
+from .base_loader import BaseLoader, env_concurrency
 
 # Lazy import so the app still works for PDF/TXT/MD/PPTX when Pillow isn't installed.
 # Image uploads will then fail with a clear message instead of crashing on import.
 
 
 class ImageLoader(BaseLoader):
-    def load(self, path: str) -> str:
+    def load(self, path: str | bytes) -> str:
+        """OCR an image file path, or raw encoded image bytes (e.g. a rendered PDF page)."""
         try:
             from PIL import Image
         except ImportError:
@@ -18,5 +22,29 @@ class ImageLoader(BaseLoader):
             raise ImportError(
                 "OCR for images requires pytesseract. Install with: pip install pytesseract"
             ) from None
-        image = Image.open(path)
+        image = Image.open(io.BytesIO(path) if isinstance(path, bytes) else path)
         return pytesseract.image_to_string(image)
+
+    async def load_many(
+        self, paths: list[str | bytes], concurrency: int | None = None
+    ) -> list[str | BaseException]:
+        """OCR several images concurrently, bounded by ``concurrency`` or else
+        OCR_CONCURRENCY (default: CPU count).
+
+        Uses aiopytesseract when installed, otherwise runs the sync loader in threads.
+        Results keep the order of ``paths``; a failed image yields its exception.
+        """
+        try:
+            import aiopytesseract
+        except ImportError:
+            aiopytesseract = None
+
+        semaphore = asyncio.Semaphore(concurrency or env_concurrency("OCR_CONCURRENCY"))
+
+        async def _ocr(path: str | bytes) -> str:
+            async with semaphore:
+                if aiopytesseract is not None:
+                    return await aiopytesseract.image_to_string(path)
+                return await asyncio.to_thread(self.load, path)
+
+        return await asyncio.gather(*(_ocr(path) for path in paths), return_exceptions=True)
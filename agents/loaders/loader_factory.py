@@ -1,21 +1,28 @@
 import os
 
+from .base_loader import BaseLoader
 from .image_loader import ImageLoader
 from .pdf_loader import PDFLoader
 from .ppt_loader import PPTLoader
 from .text_loader import TextLoader
 
+# Loaders are stateless, so one shared instance per type serves every file.
+_TEXT_LOADER = TextLoader()
+_IMAGE_LOADER = ImageLoader()
+_LOADERS: dict[str, BaseLoader] = {
+    ".pdf": PDFLoader(_IMAGE_LOADER),
+    ".txt": _TEXT_LOADER,
+    ".md": _TEXT_LOADER,
+    ".pptx": PPTLoader(),
+    ".png": _IMAGE_LOADER,
+    ".jpg": _IMAGE_LOADER,
+    ".jpeg": _IMAGE_LOADER,
+}
 
-def get_loader(path: str):
-    extension = os.path.splitext(path)[1].lower()
-
-    if extension == ".pdf":
-        return PDFLoader()
-    if extension in {".txt", ".md"}:
-        return TextLoader()
-    if extension == ".pptx":
-        return PPTLoader()
-    if extension in {".png", ".jpg", ".jpeg"}:
-        return ImageLoader()
 
-    raise ValueError(f"Unsupported file type: {extension}")
+def get_loader(path: str) -> BaseLoader:
+    extension = os.path.splitext(path)[1].lower()
+    loader = _LOADERS.get(extension)
+    if loader is None:
+        raise ValueError(f"Unsupported file type: {extension}")
+    return loader
@@ -1,14 +1,94 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import repeat
+
 import pdfplumber
 
-from .base_loader import BaseLoader
+from .base_loader import BaseLoader, env_concurrency
+from .image_loader import ImageLoader
+
+# PyMuPDF is much faster than pdfplumber for plain text extraction; pdfplumber
+# stays as the fallback when it isn't installed.
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+# Spawning worker processes only pays off once each one has a few pages to chew on.
+_MIN_PAGES_PER_WORKER = 8
+_OCR_DPI = 200
+
+
+def _iter_page_texts(pages):
+    # Release each page's cached layout objects once its text is out, so peak
+    # memory stays at roughly one page instead of the whole document.
+    for page in pages:
+        text = page.extract_text()
+        page.close()
+        if text:
+            yield text
+
+
+def _extract_pages(path: str, start: int, stop: int) -> list[str]:
+    # pdfplumber objects aren't picklable, so each worker reopens the file once
+    # and extracts its own contiguous page range.
+    with pdfplumber.open(path) as pdf:
+        return list(_iter_page_texts(pdf.pages[start:stop]))
 
 
 class PDFLoader(BaseLoader):
+    def __init__(self, image_loader: ImageLoader | None = None):
+        self._image_loader = image_loader or ImageLoader()
+
     def load(self, path: str) -> str:
-        texts = []
+        if pymupdf is None:
+            return self._load_with_pdfplumber(path)
+
+        texts: list[str] = []
+        ocr_pages: dict[Future, int] = {}
+        pending: set[Future] = set()
+        workers = env_concurrency("OCR_CONCURRENCY")
+        # Threads over the sync OCR call rather than asyncio.run(load_many), so
+        # load() still works when called from inside a running event loop.
+        with ThreadPoolExecutor(max_workers=workers) as executor, pymupdf.open(path) as document:
+            for page in document:
+                text = page.get_text("text").strip()
+                if not text and page.get_images():
+                    # Scanned page without a text layer: render it for OCR. Rendering
+                    # waits for a free worker, so only about `workers` PNGs are in memory.
+                    if len(pending) >= workers:
+                        _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    future = executor.submit(
+                        self._ocr_page, page.get_pixmap(dpi=_OCR_DPI).tobytes("png")
+                    )
+                    pending.add(future)
+                    ocr_pages[future] = len(texts)
+                texts.append(text)
+
+        for future, index in ocr_pages.items():
+            result = future.result()
+            if result is not None:
+                texts[index] = result.strip()
+
+        return "\n".join(text for text in texts if text)
+
+    def _ocr_page(self, image: bytes) -> str | None:
+        # A page that fails OCR keeps its empty text instead of failing the document.
+        try:
+            return self._image_loader.load(image)
+        except Exception:
+            return None
+
+    def _load_with_pdfplumber(self, path: str) -> str:
         with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    texts.append(text)
-        return "\n".join(texts)
+            page_count = len(pdf.pages)
+            workers = min(env_concurrency("PDF_CONCURRENCY"), page_count // _MIN_PAGES_PER_WORKER)
+            if workers < 2:
+                return "\n".join(_iter_page_texts(pdf.pages))
+
+        step = -(-page_count // workers)
+        starts = range(0, page_count, step)
+        stops = [min(start + step, page_count) for start in starts]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            batches = executor.map(_extract_pages, repeat(path), starts, stops)
+            return "\n".join(text for batch in batches for text in batch)
@@ -3,5 +3,8 @@ from .base_loader import BaseLoader
 
 class TextLoader(BaseLoader):
     def load(self, path: str) -> str:
-        with open(path, "r", encoding="utf-8") as file:
-            return file.read()
+        # Unbuffered raw read sizes its buffer from fstat, then one bulk decode.
+        with open(path, "rb", buffering=0) as file:
+            data = file.read()
+        # Text mode's universal newlines, applied after the bulk decode.
+        return data.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
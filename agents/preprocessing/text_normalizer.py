@@ -1,23 +1,31 @@
 import re
 
 
-_PAGE_PATTERNS = [
-    re.compile(r"^\d+$"),
-    re.compile(r"^page\s+\d+(\s+of\s+\d+)?$", re.IGNORECASE),
-    re.compile(r"^\d+\s*/\s*\d+$"),
-    re.compile(r"^[\(\[]?\d{1,2}[\)\]]$"),
-]
+# Page numbers, "page N of M", "N / M" and "(N)" markers, merged into one
+# alternation so each line is scanned once.
+_PAGE_RE = re.compile(
+    r"(?:\d+|page\s+\d+(?:\s+of\s+\d+)?|\d+\s*/\s*\d+|[\(\[]?\d{1,2}[\)\]])\Z",
+    re.IGNORECASE,
+)
+_MAX_ARTIFACT_LEN = 24
 
 
 def _is_page_artifact(line: str) -> bool:
     stripped = line.strip()
     if not stripped:
         return False
-    return any(pattern.match(stripped) for pattern in _PAGE_PATTERNS)
+    # Cheap reject for ordinary text lines; page markers are short and start
+    # with a digit, a bracket, or the word "page".
+    if len(stripped) > _MAX_ARTIFACT_LEN or (
+        stripped[0].isalpha() and stripped[:4].lower() != "page"
+    ):
+        return False
+    return _PAGE_RE.match(stripped) is not None
 
 
 def _ends_with_sentence_punctuation(line: str) -> bool:
-    return bool(re.search(r"[.!?;:][\"')\]]*$", line))
+    stripped = line.rstrip("\"')]")
+    return bool(stripped) and stripped[-1] in ".!?;:"
 
 
 def normalize_text(raw_text: str) -> str:
@@ -26,45 +34,34 @@ def normalize_text(raw_text: str) -> str:
     if not text:
         return ""
 
-    lines = []
+    # Single pass: whitespace cleanup, artifact filtering and soft-wrap merging
+    # all happen per line, appending straight into the output buffer.
+    merged_lines: list[str] = []
+    can_merge = False
     for raw_line in text.split("\n"):
-        line = re.sub(r"[ \t]+", " ", raw_line).strip()
-        if _is_page_artifact(line):
-            continue
-        lines.append(line)
-
-    merged_lines = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
+        line = " ".join(raw_line.split())
         if not line:
-            i += 1
+            can_merge = False
+            continue
+        if _is_page_artifact(line):
             continue
 
-        current = line
-        while i + 1 < len(lines):
-            next_line = lines[i + 1]
-            if not next_line:
-                break
-            if _ends_with_sentence_punctuation(current):
-                break
-            if not next_line[:1].islower():
-                break
-
+        if (
+            can_merge
+            and line[:1].islower()
+            and not _ends_with_sentence_punctuation(merged_lines[-1])
+        ):
+            current = merged_lines[-1]
             if current.endswith("-"):
-                current = current[:-1] + next_line.lstrip()
+                merged_lines[-1] = current[:-1] + line
             else:
-                current = f"{current} {next_line.lstrip()}"
-            i += 1
+                merged_lines[-1] = f"{current} {line}"
+            continue
 
-        merged_lines.append(current)
-        i += 1
+        merged_lines.append(line)
+        can_merge = True
 
-    normalized = "\n".join(merged_lines)
-    normalized = re.sub(r"\n{2,}", "\n", normalized)
-    normalized = re.sub(r"[ \t]{2,}", " ", normalized)
-    normalized = normalized.strip().lower()
-    return normalized
+    return "\n".join(merged_lines).lower()
 
 
 if __name__ == "__main__":
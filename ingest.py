@@ -1,33 +1,94 @@
-import json
+import asyncio
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+from agents.json_utils import json_dumps
+from agents.loaders.base_loader import env_concurrency
+from agents.loaders.image_loader import ImageLoader
 from agents.loaders.loader_factory import get_loader
 
 
+def _init_worker() -> None:
+    # The pool already uses every core; loaders inside a worker must not fan out
+    # again (pdfplumber page processes, parallel OCR) or processes multiply to cpu_count².
+    os.environ["PDF_CONCURRENCY"] = "1"
+    os.environ["OCR_CONCURRENCY"] = "1"
+
+
+def _load_one(path: str) -> tuple[str, int, str]:
+    text = get_loader(path).load(path)
+    return os.path.basename(path), len(text), text[:200]
+
+
 def ingest_directory(directory: str):
-    results = {}
+    loaded = {}
+    file_jobs = []
+    image_entries = []
+    image_loader = None
 
-    for entry in os.listdir(directory):
-        path = os.path.join(directory, entry)
-        if not os.path.isfile(path):
+    # scandir's DirEntry caches the file type from the directory listing,
+    # so there is no extra stat per file.
+    with os.scandir(directory) as it:
+        entries = [(item.name, item.path, item.is_file()) for item in it]
+
+    for entry, path, is_file in entries:
+        if not is_file:
             print(f"Skipping non-file: {entry}")
             continue
 
         try:
             loader = get_loader(path)
-            text = loader.load(path)
-            results[entry] = {
-                "chars": len(text),
-                "preview": text[:200],
-            }
-            print(f"Loaded: {entry}")
         except ValueError:
             print(f"Skipping unsupported file: {entry}")
-        except Exception as error:
-            print(f"Failed to process {entry}: {error}")
+            continue
+        if isinstance(loader, ImageLoader):
+            # OCR is batched below so Tesseract runs in parallel.
+            image_loader = loader
+            image_entries.append((entry, path))
+        else:
+            file_jobs.append(path)
+
+    # Split the cores between the process pool and this process's image OCR, so
+    # the two together stay at roughly one Tesseract/PDF job per core.
+    cpus = os.cpu_count() or 1
+    ocr_share = min(len(image_entries), cpus // 2) if file_jobs else 0
+    workers = max(1, min(cpus - ocr_share, len(file_jobs)))
+    ocr_workers = max(1, cpus - workers) if file_jobs else cpus
+    ocr_workers = min(ocr_workers, env_concurrency("OCR_CONCURRENCY"))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {executor.submit(_load_one, path): path for path in file_jobs}
+
+        # Images are OCR'd in this process while the pool works on the other files.
+        if image_entries:
+            texts = asyncio.run(
+                image_loader.load_many([path for _, path in image_entries], concurrency=ocr_workers)
+            )
+            for (entry, _), text in zip(image_entries, texts):
+                if isinstance(text, BaseException):
+                    print(f"Failed to process {entry}: {text}")
+                    continue
+                loaded[entry] = {
+                    "chars": len(text),
+                    "preview": text[:200],
+                }
+                print(f"Loaded: {entry}")
+
+        for future in as_completed(futures):
+            try:
+                entry, chars, preview = future.result()
+            except Exception as error:
+                print(f"Failed to process {os.path.basename(futures[future])}: {error}")
+                continue
+            loaded[entry] = {
+                "chars": chars,
+                "preview": preview,
+            }
+            print(f"Loaded: {entry}")
 
-    with open("ingest_output.json", "w", encoding="utf-8") as file:
-        json.dump(results, file, indent=2, ensure_ascii=False)
+    # Keep directory order in the output regardless of completion order.
+    results = {entry: loaded[entry] for entry, _, _ in entries if entry in loaded}
+    with open("ingest_output.json", "wb") as file:
+        file.write(json_dumps(results, indent=True))
 
     print("Wrote ingest_output.json")
 
@@ -1,17 +1,19 @@
-import json
+import functools
 import logging
 import os
 import re
+import sys
 import hashlib
 import threading
 import time
 import math
 from collections import Counter
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, TypedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, TypedDict
 
 from langgraph.graph import END, StateGraph
 
+from agents.json_utils import json_dumps, json_loads
 from agents.preprocessing.text_normalizer import normalize_text
 
 _log = logging.getLogger(__name__)
@@ -44,6 +46,7 @@ class PipelineState(TypedDict):
     raw_files: list
     extracted_text: str
     cleaned_text: str
+    cleaned_text_preview: str
     chunks: list
     concepts: list
     normalized_concepts: list
@@ -54,11 +57,14 @@ class PipelineState(TypedDict):
     interactive_story: dict
     final_storytelling: str
     story_beats: list
+    story_draft: dict
     llm_used: bool
     llm_status: str
 
 
-def _read_env_file_value(key: str) -> str:
+@functools.lru_cache(maxsize=1)
+def _env_map() -> dict[str, str]:
+    values: dict[str, str] = {}
     for filename in (".env.local", ".env"):
         if not os.path.exists(filename):
             continue
@@ -72,7 +78,7 @@ def _read_env_file_value(key: str) -> str:
                     left = left.strip()
                     if left.startswith("export "):
                         left = left[len("export ") :].strip()
-                    if left != key:
+                    if left in values:
                         continue
                     value = right.strip()
                     if (value.startswith('"') and value.endswith('"')) or (
@@ -81,27 +87,38 @@ def _read_env_file_value(key: str) -> str:
                         value = value[1:-1]
                     elif "#" in value:
                         value = value.split("#", 1)[0].strip()
-                    return value.strip()
+                    values[left] = value.strip()
         except Exception:
             continue
-    return ""
+    return values
 
 
-def _llm_client():
-    if genai is None:
-        return None, "google-generativeai not installed"
-    api_key = (
+def _read_env_file_value(key: str) -> str:
+    return _env_map().get(key, "")
+
+
+@functools.lru_cache(maxsize=1)
+def _get_api_key() -> str:
+    """Return the Gemini/Google API key from env or .env files."""
+    return (
         _read_env_file_value("GEMINI_API_KEY")
         or _read_env_file_value("GOOGLE_API_KEY")
         or os.getenv("GEMINI_API_KEY", "").strip()
         or os.getenv("GOOGLE_API_KEY", "").strip()
     )
+
+
+def _llm_client():
+    if genai is None:
+        return None, "google-generativeai not installed"
+    api_key = _get_api_key()
     if not api_key:
         return None, "missing GEMINI_API_KEY/GOOGLE_API_KEY"
     genai.configure(api_key=api_key)
     return genai, "ok"
 
 
+@functools.lru_cache(maxsize=1)
 def _llm_model() -> str:
     return (
         os.getenv("LASTMINUTE_LLM_MODEL", "").strip()
@@ -110,10 +127,20 @@ def _llm_model() -> str:
     )
 
 
+@functools.lru_cache(maxsize=8)
+def _get_model(name: str, system_instruction: str | None = None):
+    client, status = _llm_client()
+    if client is None:
+        return None, status
+    return client.GenerativeModel(name, system_instruction=system_instruction), status
+
+
+@functools.lru_cache(maxsize=1)
 def _cache_dir() -> str:
     return os.path.join(os.getcwd(), ".cache", "gemini_json")
 
 
+@functools.lru_cache(maxsize=1)
 def _cache_ttl_seconds() -> int:
     raw = (
         os.getenv("LASTMINUTE_GEMINI_CACHE_TTL_SECONDS", "").strip()
@@ -128,29 +155,36 @@ def _cache_ttl_seconds() -> int:
         return 60 * 60 * 24 * 7
 
 
+def _reset_env_caches() -> None:
+    """Forget memoized env-derived settings, e.g. after changing env vars in tests."""
+    _env_map.cache_clear()
+    _get_api_key.cache_clear()
+    _llm_model.cache_clear()
+    _cache_dir.cache_clear()
+    _image_cache_dir.cache_clear()
+    _image_model.cache_clear()
+    _cache_ttl_seconds.cache_clear()
+    _get_model.cache_clear()
+
+
 def _cache_key(system_prompt: str, user_prompt: str) -> str:
-    payload = json.dumps(
-        {
-            "provider": "gemini",
-            "model": _llm_model(),
-            "system_prompt": system_prompt,
-            "user_prompt": user_prompt,
-        },
-        ensure_ascii=False,
-        sort_keys=True,
-    )
-    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    # Fields are fed to the hasher one by one (NUL-separated) instead of being
+    # serialized into a JSON blob first, so long prompts aren't copied twice.
+    hasher = hashlib.sha256(b"gemini\0")
+    hasher.update(_llm_model().encode("utf-8"))
+    hasher.update(b"\0")
+    hasher.update(system_prompt.encode("utf-8"))
+    hasher.update(b"\0")
+    hasher.update(user_prompt.encode("utf-8"))
+    return hasher.hexdigest()
 
 
 def _cache_get_json(cache_key: str) -> dict[str, Any] | None:
     ttl = _cache_ttl_seconds()
     path = os.path.join(_cache_dir(), f"{cache_key}.json")
-    if not os.path.exists(path):
-        return None
-
     try:
-        with open(path, "r", encoding="utf-8") as file:
-            payload = json.load(file)
+        with open(path, "rb") as file:
+            payload = json_loads(file.read())
         cached_at = float(payload.get("cached_at", 0))
         if ttl > 0 and time.time() - cached_at > ttl:
             return None
@@ -166,16 +200,29 @@ def _cache_set_json(cache_key: str, data: dict[str, Any]) -> None:
 
     directory = _cache_dir()
     path = os.path.join(directory, f"{cache_key}.json")
-    tmp_path = f"{path}.tmp-{os.getpid()}"
     payload = {
         "cached_at": time.time(),
         "data": data,
     }
 
     try:
-        os.makedirs(directory, exist_ok=True)
-        with open(tmp_path, "w", encoding="utf-8") as file:
-            json.dump(payload, file, ensure_ascii=False)
+        # Serialized up front so the temp file gets a single binary write.
+        _write_cache_file(directory, path, json_dumps(payload))
+    except Exception:
+        pass
+
+
+def _write_cache_file(directory: str, path: str, encoded: bytes) -> None:
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        try:
+            file = open(tmp_path, "wb")
+        except FileNotFoundError:
+            # Only the first write (or one after the directory was removed) pays for makedirs.
+            os.makedirs(directory, exist_ok=True)
+            file = open(tmp_path, "wb")
+        with file:
+            file.write(encoded)
         os.replace(tmp_path, path)
     except Exception:
         try:
@@ -183,44 +230,45 @@ def _cache_set_json(cache_key: str, data: dict[str, Any]) -> None:
                 os.remove(tmp_path)
         except Exception:
             pass
+        raise
 
 
 def _parse_json(text: str) -> dict[str, Any]:
-    text = text.strip()
-    if not text:
-        return {}
+    # Well-formed responses are the common case, and both parsers skip
+    # surrounding whitespace, so only strip and slice after a failure.
     try:
-        return json.loads(text)
+        return json_loads(text)
     except Exception:
+        text = text.strip()
+        if not text:
+            return {}
         start = text.find("{")
         end = text.rfind("}")
         if start != -1 and end != -1 and end > start:
             try:
-                return json.loads(text[start : end + 1])
+                return json_loads(text[start : end + 1])
             except Exception:
                 return {}
         return {}
 
 
-@traceable(run_type="llm", name="gemini_json_call")
-def _llm_json(system_prompt: str, user_prompt: str) -> tuple[dict[str, Any], str]:
-    key = _cache_key(system_prompt, user_prompt)
-    cached = _cache_get_json(key)
-    if cached is not None:
-        return cached, "ok"
+# Appended to every system instruction. Kept byte-identical across calls so
+# Gemini's implicit context caching can reuse the prefix.
+_JSON_INSTRUCTION = "Return strictly valid JSON. Do not wrap in markdown."
 
-    client, status = _llm_client()
-    if client is None:
-        return {}, status
+# Single-flight: concurrent callers with the same cache key wait on the first
+# caller's request instead of each billing their own identical Gemini call.
+_INFLIGHT: dict[str, Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _llm_generate_json(key: str, system_prompt: str, user_prompt: str) -> tuple[dict[str, Any], str]:
     try:
-        model = client.GenerativeModel(_llm_model())
-        prompt = (
-            f"{system_prompt}\n\n"
-            "Return strictly valid JSON. Do not wrap in markdown.\n\n"
-            f"{user_prompt}"
-        )
+        model, status = _get_model(_llm_model(), f"{system_prompt}\n\n{_JSON_INSTRUCTION}")
+        if model is None:
+            return {}, status
         response = model.generate_content(
-            prompt,
+            user_prompt,
             generation_config={"temperature": 0.2},
         )
         content = response.text or "{}"
@@ -232,98 +280,171 @@ def _llm_json(system_prompt: str, user_prompt: str) -> tuple[dict[str, Any], str
         return {}, f"gemini request failed: {error}"
 
 
+@traceable(run_type="llm", name="gemini_json_call")
+def _llm_json(system_prompt: str, user_prompt: str) -> tuple[dict[str, Any], str]:
+    key = _cache_key(system_prompt, user_prompt)
+    cached = _cache_get_json(key)
+    if cached is not None:
+        return cached, "ok"
+
+    with _INFLIGHT_LOCK:
+        future = _INFLIGHT.get(key)
+        leader = future is None
+        if leader:
+            future = _INFLIGHT[key] = Future()
+    if not leader:
+        return future.result()
+
+    try:
+        # Another leader may have filled the cache between our miss and taking the slot.
+        cached = _cache_get_json(key)
+        result = (cached, "ok") if cached is not None else _llm_generate_json(key, system_prompt, user_prompt)
+        future.set_result(result)
+        return result
+    except BaseException as error:
+        future.set_exception(error)
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+
+
 @traceable(run_type="chain", name="store_raw_files")
 def store_raw_files(state: PipelineState) -> PipelineState:
     stored = [f"stored::{name}" for name in state.get("raw_files", [])]
-    return {**state, "raw_files": stored}
+    return {"raw_files": stored}
 
 
 @traceable(run_type="chain", name="extract_text")
 def extract_text(state: PipelineState) -> PipelineState:
     existing_text = state.get("extracted_text", "").strip()
     if existing_text:
-        return {**state, "extracted_text": existing_text}
+        return {"extracted_text": existing_text}
 
     files = state.get("raw_files", [])
     combined = "\n".join(f"dummy extracted text from {name}" for name in files)
     if not combined:
         combined = "dummy extracted text."
-    return {**state, "extracted_text": combined}
+    return {"extracted_text": combined}
+
+
+# Characters of cleaned text included in LLM prompts.
+_SOURCE_TEXT_LIMIT = 12000
 
 
 @traceable(run_type="chain", name="clean_text")
 def clean_text(state: PipelineState) -> PipelineState:
     text = state.get("extracted_text", "")
     cleaned = normalize_text(text)
-    return {**state, "cleaned_text": cleaned}
+    # Prompts only ever see the head of the text; slice it once for every LLM call.
+    return {"cleaned_text": cleaned, "cleaned_text_preview": cleaned[:_SOURCE_TEXT_LIMIT]}
+
+
+def _source_text(state: PipelineState) -> str:
+    # Callers that seed cleaned_text directly may not set the preview.
+    return state.get("cleaned_text_preview") or state.get("cleaned_text", "")[:_SOURCE_TEXT_LIMIT]
+
+
+_SENTENCE_BOUNDARY = re.compile(r"[.!?]\s")
+_WHITESPACE_RUN = re.compile(r"\s+")
+_CHECKLIST_BULLET = re.compile(r"^\s*[-*\d\).\]]+\s*")
+
+
+def _split_sentences(text: str) -> list[str]:
+    # Same result as re.split(r"(?<=[.!?])\s+", text) with empty pieces dropped,
+    # but walks boundary matches instead: the lookbehind form defeats the regex
+    # engine's prefix scan and is measurably slower on long texts.
+    sentences: list[str] = []
+    start = 0
+    for match in _SENTENCE_BOUNDARY.finditer(text):
+        end = match.start() + 1
+        sentence = text[start:end].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = end
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+# Sentence counts above which chunk packing is JIT-compiled with numba (if installed).
+# Below this, importing numba costs more than the loop it would speed up.
+_JIT_MIN_SENTENCES = 20000
+
+
+def _pack_sentence_ends(lengths: list[int], max_len: int) -> list[int]:
+    # Greedy packing over sentence lengths. Returns exclusive end indices; each
+    # [previous_end, end) range becomes one chunk of space-joined sentences.
+    ends: list[int] = []
+    current = -1
+    for idx, length in enumerate(lengths):
+        candidate = length if current < 0 else current + 1 + length
+        if candidate <= max_len:
+            current = candidate
+        else:
+            if current >= 0:
+                ends.append(idx)
+            current = length
+    if current >= 0:
+        ends.append(len(lengths))
+    return ends
+
+
+@functools.lru_cache(maxsize=1)
+def _jit_pack_sentence_ends():
+    try:
+        import numpy as np
+        from numba import njit
+    except Exception:
+        return None
+
+    @njit(cache=True, nogil=True)
+    def _pack(lengths, max_len):
+        ends = np.empty(len(lengths), dtype=np.int64)
+        count = 0
+        current = -1
+        for idx in range(len(lengths)):
+            length = lengths[idx]
+            candidate = length if current < 0 else current + 1 + length
+            if candidate <= max_len:
+                current = candidate
+            else:
+                if current >= 0:
+                    ends[count] = idx
+                    count += 1
+                current = length
+        if current >= 0:
+            ends[count] = len(lengths)
+            count += 1
+        return ends[:count]
+
+    return lambda lengths, max_len: _pack(np.asarray(lengths, dtype=np.int64), max_len).tolist()
 
 
 @traceable(run_type="chain", name="chunk_text")
 def chunk_text(state: PipelineState) -> PipelineState:
     text = state.get("cleaned_text", "")
     if not text:
-        return {**state, "chunks": []}
+        return {"chunks": []}
 
-    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
-    chunks = []
-    current = ""
     max_len = 350
+    sentences = _split_sentences(text)
+    lengths = [len(sentence) for sentence in sentences]
 
-    for sentence in sentences:
-        candidate = sentence if not current else f"{current} {sentence}"
-        if len(candidate) <= max_len:
-            current = candidate
-        else:
-            if current:
-                chunks.append(current)
-            current = sentence
-
-    if current:
-        chunks.append(current)
-
-    return {**state, "chunks": chunks}
+    packer = _jit_pack_sentence_ends() if len(sentences) >= _JIT_MIN_SENTENCES else None
+    chunks = []
+    start = 0
+    for end in (packer or _pack_sentence_ends)(lengths, max_len):
+        chunks.append(" ".join(sentences[start:end]))
+        start = end
 
+    return {"chunks": chunks}
 
-@traceable(run_type="chain", name="concept_extraction")
-def concept_extraction(state: PipelineState) -> PipelineState:
-    text = state.get("cleaned_text", "")
-    llm_result, llm_status = _llm_json(
-        system_prompt=(
-            "You extract high-signal study concepts from course materials. "
-            "Return valid JSON only."
-        ),
-        user_prompt=(
-            "Task: extract only explainable study concepts from the source text.\n"
-            "Hard constraints:\n"
-            "1) Return 12-30 concepts when available (do not stop at 12 if more strong concepts exist).\n"
-            "2) Keep only explainable academic concepts: principles, methods, formulas, algorithms, models, "
-            "processes, or technical terms.\n"
-            "3) Keep only concepts useful for learning, revision, or exam questions.\n"
-            "4) Exclude all administrative/logistics content: course title/number, instructor names, dates, grading, "
-            "URLs, room numbers, office hours, submission rules, textbook metadata.\n"
-            "5) Exclude sentences and long clauses.\n"
-            "6) Each concept must be a short noun phrase (1-6 words), lowercase.\n"
-            "7) Deduplicate and normalize synonyms to one canonical concept label.\n"
-            "8) Rank concepts by exam usefulness (most important first).\n"
-            "9) If not clearly explainable, exclude it.\n"
-            "Output JSON only with exact schema: {\"concepts\": [\"...\"]}\n"
-            "No markdown. No extra keys. No commentary.\n\n"
-            f"SOURCE TEXT:\n{text[:12000]}"
-        ),
-    )
-    llm_concepts = llm_result.get("concepts", [])
-    if isinstance(llm_concepts, list):
-        cleaned_llm = [str(item).strip().lower() for item in llm_concepts if str(item).strip()]
-        if cleaned_llm:
-            return {
-                **state,
-                "concepts": cleaned_llm,
-                "llm_used": True,
-                "llm_status": "ok",
-            }
 
-    words = re.findall(r"\b[a-z][a-z0-9]{2,}\b", text)
-    stopwords = {
+_WORD_RE = re.compile(r"\b[a-z][a-z0-9]{2,}\b")
+_STOPWORDS = frozenset(
+    {
         "the",
         "and",
         "for",
@@ -351,48 +472,218 @@ def concept_extraction(state: PipelineState) -> PipelineState:
         "but",
         "all",
     }
-    filtered = [w for w in words if w not in stopwords]
-    freq = Counter(filtered)
+)
+
+
+_CONCEPT_RULES = (
+    "Hard constraints:\n"
+    "1) Return 12-30 concepts when available (do not stop at 12 if more strong concepts exist).\n"
+    "2) Keep only explainable academic concepts: principles, methods, formulas, algorithms, models, "
+    "processes, or technical terms.\n"
+    "3) Keep only concepts useful for learning, revision, or exam questions.\n"
+    "4) Exclude all administrative/logistics content: course title/number, instructor names, dates, grading, "
+    "URLs, room numbers, office hours, submission rules, textbook metadata.\n"
+    "5) Exclude sentences and long clauses.\n"
+    "6) Each concept must be a short noun phrase (1-6 words), lowercase.\n"
+    "7) Deduplicate and normalize synonyms to one canonical concept label.\n"
+    "8) Rank concepts by exam usefulness (most important first).\n"
+    "9) If not clearly explainable, exclude it.\n"
+)
+
+_COMBINED_SYSTEM = (
+    "You extract high-signal study concepts from course materials and turn them into "
+    "story-driven exam-prep cards. Your output must be story-driven, exam-focused, and conversational. "
+    "Never invent topics not present in the source text. "
+    "Return valid JSON only."
+)
+
+_CONCEPTS_SYSTEM = (
+    "You extract high-signal study concepts from course materials. "
+    "Return valid JSON only."
+)
+
+_STORY_SYSTEM = (
+    "You are an expert educational story writer and exam-prep learning designer. "
+    "Your output must be story-driven, exam-focused, and conversational. "
+    "Never invent topics not present in the source text or provided concept list. "
+    "Return valid JSON only."
+)
+
+_STORY_RULES = (
+    "Goal: each card should feel like a focused exam-night scene (story first), then a checkpoint quiz.\n\n"
+    "Hard constraints:\n"
+    "1) Create exactly one story_card for each pair in TOPIC_PAIRS.\n"
+    "2) topics in each story_card must be exactly the same as one given pair.\n"
+    "3) importance must be one of: high, medium, low.\n"
+    "4) story must be substantial (at least 320 words) and align with the same concepts.\n"
+    "5) each story must show progression: setup -> struggle -> correction -> takeaway.\n"
+    "6) include micro_explanations with 2-4 short beats derived from the story (for slide rendering).\n"
+    "7) Include one checkpoint quiz in each story_card.\n"
+    "8) quiz must contain: question, options (3-4), correct_index, explanation, misconception, focus_concept, open_question, open_model_answer.\n"
+    "9) Add friend_explainers as natural conversational prompts (2-3 lines).\n"
+    "10) Keep output practical for exam prep and avoid fluff.\n"
+    "11) Do not invent extra topics or extra subtopics beyond provided concepts.\n"
+    "12) checklist must be concise and exam actionable.\n\n"
+    "13) Write in second-person voice (you/your).\n"
+    "14) Avoid textbook tone and avoid keyword dumping.\n\n"
+    "Writing style:\n"
+    "- energetic, clear, and focused\n"
+    "- cinematic but practical exam-night delivery\n"
+    "- concrete examples and reasoning steps\n\n"
+)
+
+_STORY_SCHEMA_KEYS = (
+    "\"title\": str, "
+    "\"storytelling\": str, "
+    "\"story_cards\": ["
+    "{"
+    "\"title\": str, "
+    "\"topics\": [str, ...], "
+    "\"importance\": \"high\"|\"medium\"|\"low\", "
+    "\"subtopics\": [str, ...], "
+    "\"micro_explanations\": [str, ...], "
+    "\"story\": str, "
+    "\"friend_explainers\": [str, ...], "
+    "\"quiz\": {"
+    "\"question\": str, "
+    "\"options\": [str, ...], "
+    "\"correct_index\": int, "
+    "\"explanation\": str, "
+    "\"misconception\": str, "
+    "\"focus_concept\": str, "
+    "\"open_question\": str, "
+    "\"open_model_answer\": str"
+    "}"
+    "}, ..."
+    "], "
+    "\"subtopics\": [str, str, ...], "
+    "\"checklist\": [str, ...], "
+    "\"opening\": str, "
+    "\"checkpoint\": str, "
+    "\"boss_level\": str"
+)
+
+
+def _clean(value: Any) -> str:
+    return value.strip() if isinstance(value, str) else str(value).strip()
+
+
+def _clean_items(items: Any) -> list[str]:
+    # Strip every item once and drop the blanks.
+    return [item for item in map(_clean, items) if item]
+
+
+def _llm_concepts(llm_result: dict[str, Any]) -> list[str]:
+    llm_concepts = llm_result.get("concepts", [])
+    if not isinstance(llm_concepts, list):
+        return []
+    return [item.lower() for item in _clean_items(llm_concepts)]
+
+
+def _llm_combined(source_text: str) -> tuple[dict[str, Any], str]:
+    """Extract concepts and draft the story pack on them in one Gemini round trip."""
+    return _llm_json(
+        system_prompt=_COMBINED_SYSTEM,
+        user_prompt=(
+            "Task A: extract only explainable study concepts from the source text.\n"
+            f"{_CONCEPT_RULES}\n"
+            "Task B: build story-driven scenario cards for exam revision using topic PAIRS only.\n"
+            "TOPIC_PAIRS: lowercase the Task A concepts, drop duplicates, keep the first "
+            "ceil(0.85 * count) of them (at most 10), and pair them in rank order "
+            "([1st, 2nd], [3rd, 4th], ...; a leftover concept forms its own pair).\n"
+            f"{_STORY_RULES}"
+            "Return JSON with exact keys:\n"
+            "{"
+            "\"concepts\": [str, ...], "
+            f"{_STORY_SCHEMA_KEYS}"
+            "}\n"
+            "No markdown. No extra keys. No commentary.\n\n"
+            f"SOURCE TEXT:\n{source_text}"
+        ),
+    )
+
+
+@traceable(run_type="chain", name="concept_extraction")
+def concept_extraction(state: PipelineState) -> PipelineState:
+    text = state.get("cleaned_text", "")
+    source_text = _source_text(state)
+    llm_result, llm_status = _llm_combined(source_text)
+    cleaned_llm = _llm_concepts(llm_result)
+    # Story fields ride along to generate_learning_event so it can skip its own call.
+    story_draft = (
+        {key: value for key, value in llm_result.items() if key != "concepts"}
+        if cleaned_llm
+        else {}
+    )
+    if not cleaned_llm and llm_status == "ok":
+        # Combined response was malformed: retry with the dedicated concepts prompt.
+        llm_result, llm_status = _llm_json(
+            system_prompt=_CONCEPTS_SYSTEM,
+            user_prompt=(
+                "Task: extract only explainable study concepts from the source text.\n"
+                f"{_CONCEPT_RULES}"
+                "Output JSON only with exact schema: {\"concepts\": [\"...\"]}\n"
+                "No markdown. No extra keys. No commentary.\n\n"
+                f"SOURCE TEXT:\n{source_text}"
+            ),
+        )
+        cleaned_llm = _llm_concepts(llm_result)
+    if cleaned_llm:
+        return {
+            "concepts": cleaned_llm,
+            "story_draft": story_draft,
+            "llm_used": True,
+            "llm_status": "ok",
+        }
+
+    # findall + Counter stay in C; dropping the few stopwords afterwards is cheaper
+    # than filtering every match in a generator. cleaned_text is already lowercase.
+    freq = Counter(_WORD_RE.findall(text))
+    for word in _STOPWORDS:
+        freq.pop(word, None)
     concepts = [word for word, _ in freq.most_common(12)]
     if not concepts:
         concepts = ["core-topic", "key-idea", "review-focus"]
-    return {**state, "concepts": concepts, "llm_status": llm_status}
+    return {"concepts": concepts, "llm_status": llm_status}
 
 
-@traceable(run_type="chain", name="normalize_concepts")
-def normalize_concepts(state: PipelineState) -> PipelineState:
-    seen = set()
-    normalized = []
-    for concept in state.get("concepts", []):
-        value = str(concept).strip().lower()
-        if value and value not in seen:
-            seen.add(value)
-            normalized.append(value)
-    return {**state, "normalized_concepts": normalized}
+def _normalize_concepts(concepts: list) -> list[str]:
+    # dict.fromkeys dedups in insertion order. Interned: the same concept strings
+    # are shared across priority lists, scenario seed, story pairs and checklist lookups.
+    normalized = dict.fromkeys(sys.intern(str(concept).strip().lower()) for concept in concepts)
+    normalized.pop("", None)
+    return list(normalized)
 
 
-@traceable(run_type="chain", name="estimate_priority")
-def estimate_priority(state: PipelineState) -> PipelineState:
-    normalized = state.get("normalized_concepts", [])
+def _estimate_priority(normalized: list[str]) -> list[str]:
     if not normalized:
-        return {**state, "priority_concepts": []}
+        return []
 
     # Keep broad concept coverage while preserving ranking order from concept extraction.
     # Target: at least 85% of detected concepts, capped to 10 topics.
     coverage_target = max(1, min(10, int(math.ceil(len(normalized) * 0.85))))
-    priority = normalized[:coverage_target]
-    return {**state, "priority_concepts": priority}
+    return normalized[:coverage_target]
 
 
-@traceable(run_type="chain", name="select_scenario_seed")
-def select_scenario_seed(state: PipelineState) -> PipelineState:
-    priority = state.get("priority_concepts", [])
-    seed = {
+def _select_scenario_seed(priority: list[str]) -> dict[str, Any]:
+    return {
         "focus": priority[0] if priority else "general review",
         "secondary": priority[1:],
         "mode": "deterministic-placeholder",
     }
-    return {**state, "scenario_seed": seed}
+
+
+@traceable(run_type="chain", name="finalize_concepts")
+def finalize_concepts(state: PipelineState) -> PipelineState:
+    # Normalize, prioritize and seed in one node: the steps are cheap pure
+    # transforms, so separate graph nodes only added state copies and transitions.
+    normalized = _normalize_concepts(state.get("concepts", []))
+    priority = _estimate_priority(normalized)
+    return {
+        "normalized_concepts": normalized,
+        "priority_concepts": priority,
+        "scenario_seed": _select_scenario_seed(priority),
+    }
 
 
 def _coverage_target(total: int, ratio: float = 0.85) -> int:
@@ -419,7 +710,7 @@ def _normalized_subtopic_checklist(
     seen: set[str] = set()
 
     for raw_item in llm_items:
-        item = re.sub(r"^\s*[-*\d\).\]]+\s*", "", str(raw_item)).strip()
+        item = _CHECKLIST_BULLET.sub("", str(raw_item)).strip()
         if len(item) < 4:
             continue
         key = item.lower()
@@ -431,8 +722,26 @@ def _normalized_subtopic_checklist(
     if len(cleaned) >= 4:
         return cleaned[:max_items]
 
+    fallback = _checklist_fallback_items(
+        focus, tuple(concepts), secondary[0] if secondary else None
+    )
+    for item, key in fallback:
+        if key in seen:
+            continue
+        seen.add(key)
+        cleaned.append(item)
+
+    return cleaned[:max_items]
+
+
+@functools.lru_cache(maxsize=128)
+def _checklist_fallback_items(
+    focus: str, concepts: tuple, secondary_head: Any
+) -> tuple[tuple[str, str], ...]:
+    # (item, lowercase key) pairs. Depends only on the concept set, so repeated
+    # runs over the same material reuse the built strings.
     fallback: list[str] = []
-    concept_pool = [str(concept).strip() for concept in concepts if str(concept).strip()]
+    concept_pool = _clean_items(concepts)
     if not concept_pool:
         concept_pool = [str(focus).strip() or "core topic"]
 
@@ -441,33 +750,34 @@ def _normalized_subtopic_checklist(
             f"{concept}: explain it clearly, then solve one exam-style question."
         )
     fallback.append(f"{focus}: write a 5-line summary from memory.")
-    if secondary:
-        fallback.append(f"{focus} + {secondary[0]}: connect them in one worked example.")
+    if secondary_head is not None:
+        fallback.append(f"{focus} + {secondary_head}: connect them in one worked example.")
+    return tuple((item, item.lower()) for item in fallback)
 
-    for item in fallback:
-        key = item.lower()
-        if key in seen:
-            continue
-        seen.add(key)
-        cleaned.append(item)
 
-    return cleaned[:max_items]
+def _concept_index(concepts: list[str]) -> tuple[dict[str, str], list[tuple[str, str]]]:
+    # (first concept per lowercase key, all (key, concept) pairs in order), built once
+    # per story-card pass instead of re-lowercasing the list for every topic.
+    keyed = [(concept.lower(), concept) for concept in concepts]
+    by_key: dict[str, str] = {}
+    for key, concept in keyed:
+        by_key.setdefault(key, concept)
+    return by_key, keyed
 
 
-def _match_topic_to_concept(raw_topic: str, concepts: list[str], used: set[str]) -> str:
+def _match_topic_to_concept(
+    raw_topic: str, index: tuple[dict[str, str], list[tuple[str, str]]], used: set[str]
+) -> str:
     candidate = str(raw_topic).strip().lower()
     if not candidate:
         return ""
 
-    for concept in concepts:
-        c = str(concept).strip()
-        c_key = c.lower()
-        if c_key == candidate and c_key not in used:
-            return c
+    by_key, keyed = index
+    exact = by_key.get(candidate)
+    if exact is not None and candidate not in used:
+        return exact
 
-    for concept in concepts:
-        c = str(concept).strip()
-        c_key = c.lower()
+    for c_key, c in keyed:
         if c_key in used:
             continue
         if candidate in c_key or c_key in candidate:
@@ -477,21 +787,26 @@ def _match_topic_to_concept(raw_topic: str, concepts: list[str], used: set[str])
 
 
 def _word_count(text: str) -> int:
-    return len(re.findall(r"\S+", text))
+    # Same count as findall(r"\S+"): str.split() breaks on the same whitespace set.
+    return len(text.split())
 
 
 def _ensure_min_words(text: str, min_words: int, topic_label: str) -> str:
     if min_words <= 0:
         return text.strip()
     result = text.strip()
-    while _word_count(result) < min_words:
-        result += (
-            "\n\n"
-            f"You pause at your desk, look at the clock, and commit to one more round on {topic_label}. "
-            "You say the idea out loud, catch a weak sentence, and rebuild it into a sharp exam-ready explanation. "
-            "You test yourself with one concrete example, then restate the same idea in simpler words so you can recall it under pressure."
-        )
-    return result.strip()
+    missing = min_words - _word_count(result)
+    if missing <= 0:
+        return result
+    pad = (
+        "\n\n"
+        f"You pause at your desk, look at the clock, and commit to one more round on {topic_label}. "
+        "You say the idea out loud, catch a weak sentence, and rebuild it into a sharp exam-ready explanation. "
+        "You test yourself with one concrete example, then restate the same idea in simpler words so you can recall it under pressure."
+    )
+    # The pad starts with whitespace, so word counts add up: count once instead of
+    # rescanning the growing story on every round.
+    return (result + pad * -(-missing // _word_count(pad))).strip()
 
 
 def _pair_topics(concepts: list[str]) -> list[list[str]]:
@@ -506,6 +821,16 @@ def _pair_topics(concepts: list[str]) -> list[list[str]]:
     return pairs
 
 
+def _draft_covers_pairs(cards: Any, concepts: list[str], pairs: list[list[str]]) -> bool:
+    # The combined call pairs the raw LLM concept list; only reuse its cards when
+    # _normalize_story_cards would map them onto every finalized topic pair.
+    if not isinstance(cards, list) or not cards:
+        return False
+    concept_index = _concept_index(_clean_items(concepts))
+    drafted = {_card_pair_key(card, concept_index) for card in cards}
+    return all(tuple(sorted([topic.lower() for topic in pair])) in drafted for pair in pairs)
+
+
 def _story_min_words(importance: str) -> int:
     if importance == "high":
         return 620
@@ -515,7 +840,7 @@ def _story_min_words(importance: str) -> int:
 
 
 def _fallback_micro_explanations(topics: list[str], subtopics: list[str]) -> list[str]:
-    clean_topics = [str(t).strip() for t in topics if str(t).strip()]
+    clean_topics = _clean_items(topics)
     main = clean_topics[0] if clean_topics else "core concept"
     pair = clean_topics[1] if len(clean_topics) > 1 else main
     cue = (
@@ -535,28 +860,24 @@ def _fallback_micro_explanations(topics: list[str], subtopics: list[str]) -> lis
     ]
 
 
-def _normalize_micro_explanations(raw: Any, fallback: list[str]) -> list[str]:
+def _normalize_micro_explanations(raw: Any, fallback: Callable[[], list[str]]) -> list[str]:
     if isinstance(raw, str):
         raw = [raw]
-    candidates = (
-        [str(item).strip() for item in raw if str(item).strip()]
-        if isinstance(raw, list)
-        else []
-    )
+    candidates = _clean_items(raw) if isinstance(raw, list) else []
     out: list[str] = []
     for text in candidates[:2]:
-        trimmed = re.sub(r"\s+", " ", text).strip()
+        trimmed = _WHITESPACE_RUN.sub(" ", text).strip()
         if len(trimmed) > 320:
             trimmed = trimmed[:317].rstrip() + "..."
         if trimmed:
             out.append(trimmed)
     if out:
         return out
-    return [str(item).strip() for item in fallback if str(item).strip()][:2]
+    return _clean_items(fallback())[:2]
 
 
 def _fallback_quiz_for_card(topics: list[str], subtopics: list[str]) -> dict[str, Any]:
-    clean_topics = [str(t).strip() for t in topics if str(t).strip()]
+    clean_topics = _clean_items(topics)
     main_topic = clean_topics[0] if clean_topics else "core concept"
     paired_topic = clean_topics[1] if len(clean_topics) > 1 else main_topic
     subtopic_hint = (
@@ -597,28 +918,20 @@ def _fallback_quiz_for_card(topics: list[str], subtopics: list[str]) -> dict[str
 
 
 def _normalize_quiz(
-    raw_quiz: Any, fallback_quiz: dict[str, Any], focus_topic: str
+    raw_quiz: Any, fallback_quiz: Callable[[], dict[str, Any]], focus_topic: str
 ) -> dict[str, Any]:
     quiz = raw_quiz if isinstance(raw_quiz, dict) else {}
     question = str(quiz.get("question", "")).strip() or str(
-        fallback_quiz.get("question", "")
+        fallback_quiz().get("question", "")
     ).strip()
 
     raw_options = quiz.get("options", [])
     if isinstance(raw_options, str):
         raw_options = [raw_options]
-    options = (
-        [str(item).strip() for item in raw_options if str(item).strip()]
-        if isinstance(raw_options, list)
-        else []
-    )
+    options = _clean_items(raw_options) if isinstance(raw_options, list) else []
     if len(options) < 2:
-        fallback_options = fallback_quiz.get("options", [])
-        options = (
-            [str(item).strip() for item in fallback_options if str(item).strip()]
-            if isinstance(fallback_options, list)
-            else []
-        )
+        fallback_options = fallback_quiz().get("options", [])
+        options = _clean_items(fallback_options) if isinstance(fallback_options, list) else []
     if len(options) < 2:
         options = ["Re-check the concept mapping.", "Skip the mapping step."]
 
@@ -627,28 +940,28 @@ def _normalize_quiz(
         correct_index = int(raw_correct)
     except Exception:
         try:
-            correct_index = int(fallback_quiz.get("correct_index", 0))
+            correct_index = int(fallback_quiz().get("correct_index", 0))
         except Exception:
             correct_index = 0
     correct_index = max(0, min(len(options) - 1, correct_index))
 
     explanation = str(quiz.get("explanation", "")).strip() or str(
-        fallback_quiz.get("explanation", "")
+        fallback_quiz().get("explanation", "")
     ).strip()
     misconception = str(quiz.get("misconception", "")).strip() or str(
-        fallback_quiz.get("misconception", "")
+        fallback_quiz().get("misconception", "")
     ).strip()
     focus_concept = str(
         quiz.get("focus_concept", quiz.get("focusConcept", ""))
-    ).strip() or str(fallback_quiz.get("focus_concept", "")).strip()
+    ).strip() or str(fallback_quiz().get("focus_concept", "")).strip()
     if not focus_concept:
         focus_concept = focus_topic
     open_question = str(
         quiz.get("open_question", quiz.get("openQuestion", ""))
-    ).strip() or str(fallback_quiz.get("open_question", "")).strip()
+    ).strip() or str(fallback_quiz().get("open_question", "")).strip()
     open_model_answer = str(
         quiz.get("open_model_answer", quiz.get("openModelAnswer", ""))
-    ).strip() or str(fallback_quiz.get("open_model_answer", "")).strip()
+    ).strip() or str(fallback_quiz().get("open_model_answer", "")).strip()
 
     return {
         "question": question or f"What is the first step for {focus_concept}?",
@@ -664,7 +977,7 @@ def _normalize_quiz(
 
 
 def _fallback_story_card(topics: list[str], importance: str) -> dict[str, Any]:
-    clean_topics = [str(t).strip() for t in topics if str(t).strip()]
+    clean_topics = _clean_items(topics)
     if not clean_topics:
         clean_topics = ["core concept"]
     if importance not in {"high", "medium", "low"}:
@@ -711,109 +1024,97 @@ def _fallback_story_card(topics: list[str], importance: str) -> dict[str, Any]:
     }
 
 
+def _card_pair_key(
+    raw: Any, concept_index: tuple[dict[str, str], list[tuple[str, str]]]
+) -> tuple[str, ...] | None:
+    # Order-insensitive key of the (at most two) concepts a card's topics map onto.
+    if not isinstance(raw, dict):
+        return None
+    raw_topics = raw.get("topics", [])
+    if isinstance(raw_topics, str):
+        raw_topics = [raw_topics]
+    if not isinstance(raw_topics, list):
+        return None
+
+    mapped_topics: list[str] = []
+    used_local: set[str] = set()
+    for candidate in raw_topics:
+        match = _match_topic_to_concept(str(candidate), concept_index, used_local)
+        if match:
+            used_local.add(match.lower())
+            mapped_topics.append(match)
+
+    mapped_topics = mapped_topics[:2]
+    if not mapped_topics:
+        return None
+    return tuple(sorted([topic.lower() for topic in mapped_topics]))
+
+
 def _normalize_story_cards(
     llm_cards: Any, concepts: list[str], pairs: list[list[str]]
 ) -> list[dict[str, Any]]:
     if not isinstance(llm_cards, list):
         llm_cards = []
 
-    concept_list = [str(c).strip() for c in concepts if str(c).strip()]
-    pair_lookup = {
-        tuple(sorted([topic.lower() for topic in pair])): pair for pair in pairs
-    }
-    used_pairs: set[tuple[str, ...]] = set()
-    normalized_cards: list[dict[str, Any]] = []
+    concept_index = _concept_index(_clean_items(concepts))
+    # Order-insensitive pair keys, computed once and reused for the final fill-in pass.
+    pair_keys = [tuple(sorted([topic.lower() for topic in pair])) for pair in pairs]
+    pair_lookup = dict(zip(pair_keys, pairs))
+    cards_by_key: dict[tuple[str, ...], dict[str, Any]] = {}
 
     for idx, raw in enumerate(llm_cards):
-        if not isinstance(raw, dict):
+        pair_key = _card_pair_key(raw, concept_index)
+        if pair_key is None:
             continue
-
-        raw_topics = raw.get("topics", [])
-        if isinstance(raw_topics, str):
-            raw_topics = [raw_topics]
-        if not isinstance(raw_topics, list):
+        if pair_key not in pair_lookup or pair_key in cards_by_key:
             continue
 
-        mapped_topics: list[str] = []
-        used_local: set[str] = set()
-        for candidate in raw_topics:
-            match = _match_topic_to_concept(str(candidate), concept_list, used_local)
-            if match:
-                used_local.add(match.lower())
-                mapped_topics.append(match)
-
-        mapped_topics = mapped_topics[:2]
-        if not mapped_topics:
-            continue
-
-        pair_key = tuple(sorted([topic.lower() for topic in mapped_topics]))
-        if pair_key not in pair_lookup or pair_key in used_pairs:
-            continue
-        used_pairs.add(pair_key)
-
         pair = pair_lookup[pair_key]
         importance = str(raw.get("importance", "")).strip().lower()
         if importance not in {"high", "medium", "low"}:
             importance = _importance_for_rank(idx, max(len(pairs), 1))
 
-        fallback = _fallback_story_card(pair, importance)
+        # The fallback card (with its padded story) is only built if this card
+        # leaves some field empty; complete LLM cards never pay for it.
+        fallback = functools.cache(functools.partial(_fallback_story_card, pair, importance))
 
-        title = str(raw.get("title", "")).strip() or str(fallback.get("title", "")).strip()
+        title = str(raw.get("title", "")).strip() or str(fallback()["title"]).strip()
         raw_subtopics = raw.get("subtopics", [])
-        subtopics = (
-            [str(s).strip() for s in raw_subtopics if str(s).strip()]
-            if isinstance(raw_subtopics, list)
-            else []
-        )
+        subtopics = _clean_items(raw_subtopics) if isinstance(raw_subtopics, list) else []
         subtopics = subtopics[:2]
         if not subtopics:
-            subtopics = fallback.get("subtopics", [])
+            subtopics = fallback()["subtopics"]
 
-        story = str(raw.get("story", "")).strip() or str(fallback.get("story", "")).strip()
+        story = str(raw.get("story", "")).strip() or str(fallback()["story"]).strip()
         story = _ensure_min_words(story, _story_min_words(importance), " + ".join(pair))
-        fallback_micro = fallback.get(
-            "micro_explanations", _fallback_micro_explanations(pair, subtopics)
-        )
         micro_explanations = _normalize_micro_explanations(
             raw.get("micro_explanations", raw.get("microExplanations", [])),
-            fallback_micro if isinstance(fallback_micro, list) else [],
+            lambda: fallback()["micro_explanations"],
         )
 
         raw_friend = raw.get("friend_explainers", [])
-        friend_explainers = (
-            [str(item).strip() for item in raw_friend if str(item).strip()]
-            if isinstance(raw_friend, list)
-            else []
-        )
+        friend_explainers = _clean_items(raw_friend) if isinstance(raw_friend, list) else []
         if not friend_explainers:
-            friend_explainers = fallback.get("friend_explainers", [])
-        fallback_quiz = fallback.get("quiz", _fallback_quiz_for_card(pair, subtopics))
+            friend_explainers = fallback()["friend_explainers"]
         quiz = _normalize_quiz(
             raw.get("quiz", raw.get("topic_quiz", {})),
-            fallback_quiz if isinstance(fallback_quiz, dict) else {},
+            lambda: fallback()["quiz"],
             pair[0] if pair else "",
         )
 
-        normalized_cards.append(
-            {
-                "title": title,
-                "topics": pair,
-                "importance": importance,
-                "subtopics": subtopics,
-                "story": story,
-                "micro_explanations": micro_explanations,
-                "friend_explainers": friend_explainers,
-                "quiz": quiz,
-            }
-        )
+        cards_by_key[pair_key] = {
+            "title": title,
+            "topics": pair,
+            "importance": importance,
+            "subtopics": subtopics,
+            "story": story,
+            "micro_explanations": micro_explanations,
+            "friend_explainers": friend_explainers,
+            "quiz": quiz,
+        }
 
-    cards_by_key = {
-        tuple(sorted([str(topic).lower() for topic in card.get("topics", [])])): card
-        for card in normalized_cards
-    }
     complete_cards: list[dict[str, Any]] = []
-    for idx, pair in enumerate(pairs):
-        key = tuple(sorted([topic.lower() for topic in pair]))
+    for idx, (pair, key) in enumerate(zip(pairs, pair_keys)):
         if key in cards_by_key:
             card = cards_by_key[key]
             if card.get("importance") not in {"high", "medium", "low"}:
@@ -832,7 +1133,7 @@ def _story_cards_to_checklist(story_cards: list[dict[str, Any]]) -> list[str]:
     for card in story_cards:
         topics = card.get("topics", [])
         if isinstance(topics, list):
-            clean_topics = [str(topic).strip() for topic in topics if str(topic).strip()]
+            clean_topics = _clean_items(topics)
         else:
             clean_topics = []
         if not clean_topics:
@@ -853,6 +1154,13 @@ def _story_cards_to_checklist(story_cards: list[dict[str, Any]]) -> list[str]:
     return items
 
 
+_IMPORTANCE_LABELS = {
+    "high": "High Priority",
+    "medium": "Medium Priority",
+    "low": "Low Priority",
+}
+
+
 def _compose_story_text(
     title: str,
     opening: str,
@@ -866,18 +1174,14 @@ def _compose_story_text(
         topics = card.get("topics", [])
         if not isinstance(topics, list):
             topics = []
-        topic_label = " + ".join(str(topic).strip() for topic in topics if str(topic).strip()) or "core concepts"
+        topic_label = " + ".join(_clean_items(topics)) or "core concepts"
         importance = str(card.get("importance", "medium")).strip().lower()
-        importance_label = {
-            "high": "High Priority",
-            "medium": "Medium Priority",
-            "low": "Low Priority",
-        }.get(importance, "Priority")
+        importance_label = _IMPORTANCE_LABELS.get(importance, "Priority")
         card_title = str(card.get("title", "")).strip() or f"{topic_label} story card"
 
         micro = card.get("micro_explanations", [])
         if isinstance(micro, list):
-            micro_text = [str(item).strip() for item in micro if str(item).strip()]
+            micro_text = _clean_items(micro)
         else:
             micro_text = []
         if not micro_text:
@@ -890,7 +1194,7 @@ def _compose_story_text(
         if not isinstance(friend, list):
             friend = []
         friend_text = (
-            "\n".join(f"- {str(item).strip()}" for item in friend if str(item).strip())
+            "\n".join(f"- {item}" for item in _clean_items(friend))
             or "- explain this topic pair to a friend."
         )
         quiz = card.get("quiz", {})
@@ -899,7 +1203,7 @@ def _compose_story_text(
             question = str(quiz.get("question", "")).strip()
             options = quiz.get("options", [])
             if isinstance(options, list):
-                clean_options = [str(opt).strip() for opt in options if str(opt).strip()]
+                clean_options = _clean_items(options)
             else:
                 clean_options = []
             if question and clean_options:
@@ -918,7 +1222,6 @@ def _compose_story_text(
             if open_question:
                 quiz_text += f"\nOpen answer: {open_question}"
 
-        story = str(card.get("story", "")).strip()
         block = (
             f"Topic {idx + 1}: {card_title}\n"
             f"Focus: {topic_label} ({importance_label})\n\n"
@@ -929,23 +1232,26 @@ def _compose_story_text(
         blocks.append(block.strip())
 
     checklist_text = "\n- ".join(checklist) if checklist else "No checklist generated."
-    return (
-        f"{title}\n\n"
-        f"Act 1 - Mission Brief:\n{opening}\n\n"
-        f"Act 2 - Story Cards:\n\n"
-        + "\n\n".join(blocks)
-        + "\n\n"
-        f"Act 3 - Checkpoint:\n{checkpoint}\n\n"
-        f"Final Boss:\n{boss_level}\n\n"
-        f"Mission Checklist:\n- {checklist_text}"
+    # One join over every section instead of chained + on the growing text.
+    # With no cards, the empty placeholder keeps the blank section in place.
+    return "\n\n".join(
+        [
+            title,
+            f"Act 1 - Mission Brief:\n{opening}",
+            "Act 2 - Story Cards:",
+            *(blocks or [""]),
+            f"Act 3 - Checkpoint:\n{checkpoint}",
+            f"Final Boss:\n{boss_level}",
+            f"Mission Checklist:\n- {checklist_text}",
+        ]
     )
 
 
 @traceable(run_type="chain", name="generate_learning_event")
 def generate_learning_event(state: PipelineState) -> PipelineState:
     seed = state.get("scenario_seed", {})
-    all_concepts = [str(c).strip() for c in state.get("normalized_concepts", []) if str(c).strip()]
-    prioritized = [str(c).strip() for c in state.get("priority_concepts", []) if str(c).strip()]
+    all_concepts = _clean_items(state.get("normalized_concepts", []))
+    prioritized = _clean_items(state.get("priority_concepts", []))
     if not prioritized:
         prioritized = all_concepts[:10]
 
@@ -976,72 +1282,28 @@ def generate_learning_event(state: PipelineState) -> PipelineState:
     secondary = [c for c in concepts if c.lower() != focus.lower()]
     topic_pairs = _pair_topics(concepts)
 
-    llm_result, llm_status = _llm_json(
-        system_prompt=(
-            "You are an expert educational story writer and exam-prep learning designer. "
-            "Your output must be story-driven, exam-focused, and conversational. "
-            "Never invent topics not present in the source text or provided concept list. "
-            "Return valid JSON only."
-        ),
-        user_prompt=(
-            "Task: build story-driven scenario cards for exam revision using topic PAIRS only.\n"
-            "Goal: each card should feel like a focused exam-night scene (story first), then a checkpoint quiz.\n\n"
-            "Hard constraints:\n"
-            "1) Create exactly one story_card for each pair in TOPIC_PAIRS.\n"
-            "2) topics in each story_card must be exactly the same as one given pair.\n"
-            "3) importance must be one of: high, medium, low.\n"
-            "4) story must be substantial (at least 320 words) and align with the same concepts.\n"
-            "5) each story must show progression: setup -> struggle -> correction -> takeaway.\n"
-            "6) include micro_explanations with 2-4 short beats derived from the story (for slide rendering).\n"
-            "7) Include one checkpoint quiz in each story_card.\n"
-            "8) quiz must contain: question, options (3-4), correct_index, explanation, misconception, focus_concept, open_question, open_model_answer.\n"
-            "9) Add friend_explainers as natural conversational prompts (2-3 lines).\n"
-            "10) Keep output practical for exam prep and avoid fluff.\n"
-            "11) Do not invent extra topics or extra subtopics beyond provided concepts.\n"
-            "12) checklist must be concise and exam actionable.\n\n"
-            "13) Write in second-person voice (you/your).\n"
-            "14) Avoid textbook tone and avoid keyword dumping.\n\n"
-            "Writing style:\n"
-            "- energetic, clear, and focused\n"
-            "- cinematic but practical exam-night delivery\n"
-            "- concrete examples and reasoning steps\n\n"
-            "Return JSON with exact keys:\n"
-            "{"
-            "\"title\": str, "
-            "\"storytelling\": str, "
-            "\"story_cards\": ["
-            "{"
-            "\"title\": str, "
-            "\"topics\": [str, ...], "
-            "\"importance\": \"high\"|\"medium\"|\"low\", "
-            "\"subtopics\": [str, ...], "
-            "\"micro_explanations\": [str, ...], "
-            "\"story\": str, "
-            "\"friend_explainers\": [str, ...], "
-            "\"quiz\": {"
-            "\"question\": str, "
-            "\"options\": [str, ...], "
-            "\"correct_index\": int, "
-            "\"explanation\": str, "
-            "\"misconception\": str, "
-            "\"focus_concept\": str, "
-            "\"open_question\": str, "
-            "\"open_model_answer\": str"
-            "}"
-            "}, ..."
-            "], "
-            "\"subtopics\": [str, str, ...], "
-            "\"checklist\": [str, ...], "
-            "\"opening\": str, "
-            "\"checkpoint\": str, "
-            "\"boss_level\": str"
-            "}\n"
-            "No markdown. No extra keys. No commentary.\n\n"
-            f"CONCEPTS: {concepts}\n\n"
-            f"TOPIC_PAIRS: {topic_pairs}\n\n"
-            f"SOURCE TEXT:\n{state.get('cleaned_text', '')[:12000]}"
-        ),
-    )
+    story_draft = state.get("story_draft", {})
+    if isinstance(story_draft, dict) and _draft_covers_pairs(
+        story_draft.get("story_cards"), concepts, topic_pairs
+    ):
+        # Drafted alongside concept extraction; no second Gemini round trip needed.
+        llm_result, llm_status = story_draft, "ok"
+    else:
+        llm_result, llm_status = _llm_json(
+            system_prompt=_STORY_SYSTEM,
+            user_prompt=(
+                "Task: build story-driven scenario cards for exam revision using topic PAIRS only.\n"
+                f"{_STORY_RULES}"
+                "Return JSON with exact keys:\n"
+                "{"
+                f"{_STORY_SCHEMA_KEYS}"
+                "}\n"
+                "No markdown. No extra keys. No commentary.\n\n"
+                f"CONCEPTS: {concepts}\n\n"
+                f"TOPIC_PAIRS: {topic_pairs}\n\n"
+                f"SOURCE TEXT:\n{_source_text(state)}"
+            ),
+        )
     if llm_result:
         title = str(llm_result.get("title", f"LastMinute Mission: {focus}")).strip()
         storytelling_summary = str(llm_result.get("storytelling", "")).strip()
@@ -1055,9 +1317,9 @@ def generate_learning_event(state: PipelineState) -> PipelineState:
         llm_checklist = llm_result.get("checklist", [])
         llm_items: list[str] = []
         if isinstance(llm_subtopics, list):
-            llm_items.extend(str(item).strip() for item in llm_subtopics if str(item).strip())
+            llm_items.extend(_clean_items(llm_subtopics))
         if isinstance(llm_checklist, list):
-            llm_items.extend(str(item).strip() for item in llm_checklist if str(item).strip())
+            llm_items.extend(_clean_items(llm_checklist))
         llm_items.extend(_story_cards_to_checklist(story_cards))
 
         checklist = _normalized_subtopic_checklist(
@@ -1099,7 +1361,6 @@ def generate_learning_event(state: PipelineState) -> PipelineState:
             "coverage_ratio": round(len(concepts) / max(len(all_concepts), 1), 3),
         }
         return {
-            **state,
             "learning_event": event,
             "todo_checklist": checklist,
             "interactive_story": story,
@@ -1149,7 +1410,6 @@ def generate_learning_event(state: PipelineState) -> PipelineState:
         "coverage_ratio": round(len(concepts) / max(len(all_concepts), 1), 3),
     }
     return {
-        **state,
         "learning_event": event,
         "todo_checklist": checklist,
         "interactive_story": story,
@@ -1158,26 +1418,155 @@ def generate_learning_event(state: PipelineState) -> PipelineState:
     }
 
 
-def _get_api_key() -> str:
-    """Return the Gemini/Google API key from env or .env files."""
-    return (
-        _read_env_file_value("GEMINI_API_KEY")
-        or _read_env_file_value("GOOGLE_API_KEY")
-        or os.getenv("GEMINI_API_KEY", "").strip()
-        or os.getenv("GOOGLE_API_KEY", "").strip()
-    )
+class _TokenBucket:
+    """Blocking token bucket: bursts up to `capacity`, then `rate` calls per second."""
+
+    def __init__(self, capacity: float, rate: float) -> None:
+        self._capacity = capacity
+        self._rate = rate
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            # Reserve a token even if that leaves the balance negative; the debt
+            # is this caller's wait, so waiters queue up without polling the lock.
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
 
 
-_IMG_LOCK = threading.Lock()
-_IMG_LAST_CALL = 0.0
 _IMG_MIN_INTERVAL = 4.0
+_IMG_BURST = 3
 _IMG_MAX_RETRIES = 4
 _IMG_BASE_BACKOFF = 5.0
+# Rate limiting and transient server errors; any other non-200 status fails fast.
+_IMG_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_IMG_BUCKET = _TokenBucket(capacity=_IMG_BURST, rate=1.0 / _IMG_MIN_INTERVAL)
+
+
+_IMG_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+_JSON_HEADERS = {"Content-Type": "application/json"}
+# Parallel image requests (LASTMINUTE_IMG_WORKERS); the keep-alive pool is sized to match.
+_IMG_DEFAULT_WORKERS = 8
+_IMG_BATCH_POLL_INTERVAL = 5.0
+# Bump when _image_request's prompt template changes so cached images are not reused.
+_IMG_CACHE_VERSION = "1"
+
+
+@functools.lru_cache(maxsize=1)
+def _image_cache_dir() -> str:
+    return os.path.join(os.getcwd(), ".cache", "gemini_images")
+
+
+def _image_cache_path(image_model: str, description: str) -> str:
+    hasher = hashlib.sha256(f"image\0{_IMG_CACHE_VERSION}\0".encode("utf-8"))
+    hasher.update(image_model.encode("utf-8"))
+    hasher.update(b"\0")
+    hasher.update(description.encode("utf-8"))
+    return os.path.join(_image_cache_dir(), f"{hasher.hexdigest()}.txt")
+
+
+def _image_cache_get(path: str) -> str | None:
+    # Entries are bare data URLs; the file's mtime is the cache timestamp.
+    ttl = _cache_ttl_seconds()
+    try:
+        with open(path, "r", encoding="ascii") as file:
+            if ttl > 0 and time.time() - os.fstat(file.fileno()).st_mtime > ttl:
+                return None
+            return file.read() or None
+    except Exception:
+        return None
+
+
+def _image_cache_set(path: str, image: str) -> None:
+    if _cache_ttl_seconds() == 0:
+        return
+    try:
+        _write_cache_file(_image_cache_dir(), path, image.encode("ascii"))
+    except Exception:
+        pass
+
+
+def _image_workers() -> int:
+    raw = os.getenv("LASTMINUTE_IMG_WORKERS", "").strip()
+    try:
+        workers = int(raw) if raw else _IMG_DEFAULT_WORKERS
+    except Exception:
+        workers = _IMG_DEFAULT_WORKERS
+    return max(1, workers)
+
+
+@functools.lru_cache(maxsize=1)
+def _http_session():
+    # One keep-alive session for every image call, so retries and parallel
+    # workers reuse TLS connections instead of handshaking per request.
+    session = _http.Session()
+    adapter = _http.adapters.HTTPAdapter(pool_maxsize=_image_workers())
+    session.mount("https://", adapter)
+    return session
+
+
+@functools.lru_cache(maxsize=1)
+def _image_model() -> str:
+    # Use LASTMINUTE_IMAGE_MODEL if set (e.g. Imagen 3 / best quality), else derive from LLM model.
+    # Gemini image models: gemini-2.5-flash-image (Nano Banana) or gemini-3-pro-image-preview (Pro).
+    image_model = os.getenv("LASTMINUTE_IMAGE_MODEL", "").strip()
+    if image_model:
+        return image_model
+    base_model = (
+        os.getenv("LASTMINUTE_LLM_MODEL", "").strip()
+        or _read_env_file_value("LASTMINUTE_LLM_MODEL")
+    )
+    if not base_model:
+        return ""
+    return base_model if base_model.endswith("-image") else f"{base_model}-image"
+
+
+# Fixed prompt boilerplate, kept as constants so every request shares one string
+# object and the template lives in one place (see _IMG_CACHE_VERSION).
+_IMAGE_RENDER_SUFFIX = (
+    " Render as a single, high-clarity diagram: crisp lines, "
+    "distinct elements, no blur. Each concept must have a "
+    "unique visual — no repeated icons or duplicate labels. "
+    "No placeholder or lorem ipsum text."
+)
+_IMAGE_STYLE_SUFFIX = (
+    ". Style: crisp vector-style illustration, high clarity, bold shapes. "
+    "Each element must have a UNIQUE icon or shape. No placeholder text."
+)
+
+
+def _image_request(description: str) -> dict[str, Any]:
+    # API requires uppercase: ["TEXT", "IMAGE"] (case-sensitive).
+    return {
+        "contents": [{"parts": [{"text": description + _IMAGE_RENDER_SUFFIX}]}],
+        "generationConfig": {"responseModalities": ["TEXT", "IMAGE"]},
+    }
+
+
+def _image_from_response(data: dict[str, Any]) -> str | None:
+    candidates = data.get("candidates", [])
+    if not candidates:
+        _log.warning("Image gen: no candidates in response")
+        return None
+    parts = candidates[0].get("content", {}).get("parts", [])
+    for part in parts:
+        inline = part.get("inlineData")
+        if inline and inline.get("data"):
+            mime = inline.get("mimeType", "image/png")
+            return f"data:{mime};base64,{inline['data']}"
+    _log.warning("Image gen: no inlineData in candidate parts")
+    return None
 
 
 def _generate_image(description: str) -> str | None:
     """Call Gemini image generation API with retry + rate limiting."""
-    global _IMG_LAST_CALL
     api_key = _get_api_key()
     if not api_key:
         _log.warning("Image gen skipped: no GEMINI_API_KEY / GOOGLE_API_KEY")
@@ -1186,78 +1575,43 @@ def _generate_image(description: str) -> str | None:
         _log.warning("Image gen skipped: 'requests' not installed (pip install requests)")
         return None
 
-    # Use LASTMINUTE_IMAGE_MODEL if set (e.g. Imagen 3 / best quality), else derive from LLM model.
-    # Gemini image models: gemini-2.5-flash-image (Nano Banana) or gemini-3-pro-image-preview (Pro).
-    image_model = os.getenv("LASTMINUTE_IMAGE_MODEL", "").strip()
+    image_model = _image_model()
     if not image_model:
-        base_model = (
-            os.getenv("LASTMINUTE_LLM_MODEL", "").strip()
-            or _read_env_file_value("LASTMINUTE_LLM_MODEL")
-        )
-        if not base_model:
-            _log.warning("Image gen skipped: no LASTMINUTE_IMAGE_MODEL or LASTMINUTE_LLM_MODEL")
-            return None
-        image_model = base_model if base_model.endswith("-image") else f"{base_model}-image"
-    url = (
-        "https://generativelanguage.googleapis.com/v1beta/models/"
-        f"{image_model}:generateContent?key={api_key}"
-    )
-    # API requires uppercase: ["TEXT", "IMAGE"] (case-sensitive).
-    payload = {
-        "contents": [
-            {
-                "parts": [
-                    {
-                        "text": (
-                            f"{description} "
-                            "Render as a single, high-clarity diagram: crisp lines, "
-                            "distinct elements, no blur. Each concept must have a "
-                            "unique visual — no repeated icons or duplicate labels. "
-                            "No placeholder or lorem ipsum text."
-                        )
-                    }
-                ]
-            }
-        ],
-        "generationConfig": {"responseModalities": ["TEXT", "IMAGE"]},
-    }
+        _log.warning("Image gen skipped: no LASTMINUTE_IMAGE_MODEL or LASTMINUTE_LLM_MODEL")
+        return None
+    cache_path = _image_cache_path(image_model, description)
+    cached = _image_cache_get(cache_path)
+    if cached is not None:
+        return cached
+
+    url = f"{_IMG_API_BASE}/models/{image_model}:generateContent?key={api_key}"
+    # Serialized once; retries resend the same bytes.
+    body = json_dumps(_image_request(description))
     last_error: str | None = None
     for attempt in range(_IMG_MAX_RETRIES):
-        with _IMG_LOCK:
-            now = time.monotonic()
-            wait = _IMG_MIN_INTERVAL - (now - _IMG_LAST_CALL)
-            if wait > 0:
-                time.sleep(wait)
-            _IMG_LAST_CALL = time.monotonic()
+        _IMG_BUCKET.acquire()
         try:
-            resp = _http.post(url, json=payload, timeout=90)
-            if resp.status_code in (429, 500, 502, 503):
+            resp = _http_session().post(url, data=body, headers=_JSON_HEADERS, timeout=90)
+            if resp.status_code in _IMG_RETRY_STATUSES:
                 last_error = f"status={resp.status_code} body={resp.text[:500]}"
                 _log.warning("Image gen attempt %s: %s", attempt + 1, last_error)
-                time.sleep(_IMG_BASE_BACKOFF * (2 ** attempt))
+                if attempt < _IMG_MAX_RETRIES - 1:
+                    time.sleep(_IMG_BASE_BACKOFF * (2 ** attempt))
                 continue
             if resp.status_code != 200:
                 last_error = f"status={resp.status_code} body={resp.text[:800]}"
                 _log.warning("Image gen failed: %s", last_error)
                 return None
-            data = resp.json()
+            data = json_loads(resp.content)
             # Check for API error in JSON (e.g. blocked, model not found)
             if "error" in data:
                 last_error = str(data.get("error", data))[:500]
                 _log.warning("Image gen API error: %s", last_error)
                 return None
-            candidates = data.get("candidates", [])
-            if not candidates:
-                _log.warning("Image gen: no candidates in response")
-                return None
-            parts = candidates[0].get("content", {}).get("parts", [])
-            for part in parts:
-                inline = part.get("inlineData")
-                if inline and inline.get("data"):
-                    mime = inline.get("mimeType", "image/png")
-                    return f"data:{mime};base64,{inline['data']}"
-            _log.warning("Image gen: no inlineData in candidate parts")
-            return None
+            image = _image_from_response(data)
+            if image:
+                _image_cache_set(cache_path, image)
+            return image
         except Exception as e:
             last_error = str(e)
             _log.warning("Image gen exception: %s", last_error)
@@ -1266,13 +1620,114 @@ def _generate_image(description: str) -> str | None:
     return None
 
 
+def _image_batch_timeout() -> float:
+    raw = os.getenv("LASTMINUTE_IMAGE_BATCH", "").strip().lower()
+    if raw in {"", "0", "false", "no", "off"}:
+        return 0.0
+    raw_timeout = os.getenv("LASTMINUTE_IMAGE_BATCH_TIMEOUT_SECONDS", "").strip()
+    try:
+        return max(float(raw_timeout), 0.0) if raw_timeout else 600.0
+    except Exception:
+        return 600.0
+
+
+def _generate_images_batch(descriptions: list[str]) -> list[str | None] | None:
+    """Generate all images as one Gemini Batch API job.
+
+    None means the batch could not run; a None entry means that image is missing.
+    Callers fall back to per-image calls for either.
+    """
+    timeout = _image_batch_timeout()
+    api_key = _get_api_key()
+    image_model = _image_model()
+    if not descriptions or timeout <= 0 or not api_key or not image_model or _http is None:
+        return None
+
+    cache_paths = [_image_cache_path(image_model, description) for description in descriptions]
+    images: list[str | None] = [_image_cache_get(path) for path in cache_paths]
+    missing = [idx for idx, image in enumerate(images) if image is None]
+    if not missing:
+        return images
+
+    headers = {"x-goog-api-key": api_key, **_JSON_HEADERS}
+    body = {
+        "batch": {
+            "display_name": "lastminute-story-visuals",
+            "input_config": {
+                "requests": {
+                    "requests": [
+                        {"request": _image_request(descriptions[idx]), "metadata": {"key": str(idx)}}
+                        for idx in missing
+                    ]
+                }
+            },
+        }
+    }
+    try:
+        session = _http_session()
+        resp = session.post(
+            f"{_IMG_API_BASE}/models/{image_model}:batchGenerateContent",
+            data=json_dumps(body),
+            headers=headers,
+            timeout=90,
+        )
+        if resp.status_code != 200:
+            _log.warning("Image batch submit failed: status=%s body=%s", resp.status_code, resp.text[:500])
+            return None
+        batch_name = json_loads(resp.content).get("name", "")
+        if not batch_name:
+            _log.warning("Image batch submit returned no batch name")
+            return None
+
+        deadline = time.monotonic() + timeout
+        while True:
+            resp = session.get(f"{_IMG_API_BASE}/{batch_name}", headers=headers, timeout=30)
+            if resp.status_code != 200:
+                # Expired key, missing batch or quota: re-polling until the deadline won't help.
+                _log.warning("Image batch poll failed: status=%s body=%s", resp.status_code, resp.text[:500])
+                return None
+            operation = json_loads(resp.content)
+            if "error" in operation:
+                _log.warning("Image batch error: %s", str(operation["error"])[:500])
+                return None
+            if operation.get("done"):
+                break
+            if time.monotonic() >= deadline:
+                _log.warning("Image batch %s timed out; cancelling", batch_name)
+                session.post(f"{_IMG_API_BASE}/{batch_name}:cancel", headers=headers, timeout=30)
+                return None
+            time.sleep(_IMG_BATCH_POLL_INTERVAL)
+    except Exception as e:
+        _log.warning("Image batch exception: %s", e)
+        return None
+
+    inlined = operation.get("response", {}).get("inlinedResponses", [])
+    if isinstance(inlined, dict):
+        inlined = inlined.get("inlinedResponses", [])
+
+    for position, item in enumerate(inlined):
+        try:
+            idx = int(item.get("metadata", {}).get("key", missing[position]))
+        except Exception:
+            continue
+        if 0 <= idx < len(images) and isinstance(item.get("response"), dict):
+            images[idx] = _image_from_response(item["response"])
+            if images[idx]:
+                _image_cache_set(cache_paths[idx], images[idx])
+    return images
+
+
+def _story_visual_prompt(prompt_text: str) -> str:
+    return f"Create a single, clear educational diagram: {prompt_text}{_IMAGE_STYLE_SUFFIX}"
+
+
 @traceable(run_type="chain", name="generate_story_visuals")
 def generate_story_visuals(state: PipelineState) -> PipelineState:
     """Generate a small number of visuals tied to explanation beats per topic card."""
     story = state.get("interactive_story", {})
     topic_cards = story.get("topic_storylines", []) if isinstance(story, dict) else []
     if not isinstance(topic_cards, list) or not topic_cards:
-        return {**state, "story_beats": []}
+        return {"story_beats": []}
 
     raw_max = os.getenv("LASTMINUTE_MAX_VISUALS_PER_TOPIC", "").strip()
     try:
@@ -1281,30 +1736,30 @@ def generate_story_visuals(state: PipelineState) -> PipelineState:
         max_visuals_per_topic = 2
     max_visuals_per_topic = max(0, min(4, max_visuals_per_topic))
     if max_visuals_per_topic == 0:
-        return {**state, "story_beats": []}
+        return {"story_beats": []}
 
     beats: list[dict[str, Any]] = []
     for idx, card in enumerate(topic_cards):
         topics = card.get("topics", [])
         label = (
-            " + ".join(str(t).strip() for t in topics if str(t).strip())
+            " + ".join(_clean_items(topics))
             or str(card.get("title", f"Topic {idx + 1}")).strip()
         )
 
         raw_micro = card.get("micro_explanations", [])
         if isinstance(raw_micro, list):
-            micro = [str(item).strip() for item in raw_micro if str(item).strip()]
+            micro = _clean_items(raw_micro)
         else:
             micro = []
         if not micro:
             story_text = str(card.get("story", "")).strip()
-            parts = [p.strip() for p in re.split(r"(?<=[.!?])\s+", story_text) if p.strip()]
+            parts = _split_sentences(story_text)
             micro = parts[:2] if parts else [f"Core explanation for {label}."]
         micro = micro[:max_visuals_per_topic]
 
         image_steps: list[dict[str, Any]] = []
         for exp_idx, explanation in enumerate(micro):
-            clean_explanation = re.sub(r"\s+", " ", explanation).strip()
+            clean_explanation = _WHITESPACE_RUN.sub(" ", explanation).strip()
             prompt = (
                 f"Teach {label} with one concise educational visual. "
                 f"Support this explanation beat: {clean_explanation}. "
@@ -1328,34 +1783,53 @@ def generate_story_visuals(state: PipelineState) -> PipelineState:
             }
         )
 
-    # Generate images for all steps in parallel
-    def _gen_step_image(beat_idx: int, step_idx: int, prompt_text: str) -> tuple[int, int, str | None]:
-        if not prompt_text:
-            return beat_idx, step_idx, None
-        full_prompt = (
-            f"Create a single, clear educational diagram: {prompt_text}. "
-            "Style: crisp vector-style illustration, high clarity, bold shapes. "
-            "Each element must have a UNIQUE icon or shape. No placeholder text."
-        )
-        return beat_idx, step_idx, _generate_image(full_prompt)
-
-    jobs: list[tuple[int, int, str]] = []
+    # Identical prompts (e.g. a topic card repeated across beats) share one image
+    # request; the result is fanned out to every step that asked for it.
+    targets: dict[str, list[tuple[int, int]]] = {}
     for bi, beat in enumerate(beats):
         for si, step in enumerate(beat["image_steps"]):
             if step.get("prompt"):
-                jobs.append((bi, si, step["prompt"]))
+                targets.setdefault(step["prompt"], []).append((bi, si))
+    prompts = list(targets)
+
+    def _assign(prompt_text: str, img: str | None) -> None:
+        if img:
+            for bi, si in targets[prompt_text]:
+                beats[bi]["image_steps"][si]["image_data"] = img
+
+    # Opt-in (LASTMINUTE_IMAGE_BATCH): one Batch API job instead of rate-limited
+    # per-image calls. Prompts the batch couldn't produce (or all of them, if it
+    # can't run) fall through to the per-image path.
+    images = _generate_images_batch([_story_visual_prompt(p) for p in prompts])
+    if images is not None:
+        pending = []
+        for prompt_text, img in zip(prompts, images):
+            if img:
+                _assign(prompt_text, img)
+            else:
+                pending.append(prompt_text)
+        prompts = pending
 
-    with ThreadPoolExecutor(max_workers=2) as pool:
-        futures = [pool.submit(_gen_step_image, bi, si, p) for bi, si, p in jobs]
-        for future in as_completed(futures):
-            try:
-                bi, si, img = future.result()
-                if img:
-                    beats[bi]["image_steps"][si]["image_data"] = img
-            except Exception:
-                pass
+    if not prompts:
+        return {"story_beats": beats}
+
+    # Requests are network-bound and paced by the shared token bucket, so the
+    # thread count only needs to cover in-flight calls.
+    def _on_done(prompt_text: str, future: Future) -> None:
+        # Runs as each request lands, so slots fill in completion order without a
+        # collector loop; failures are logged instead of vanishing.
+        error = future.exception()
+        if error is not None:
+            _log.warning("Image gen for %r failed: %s", prompt_text[:80], error)
+            return
+        _assign(prompt_text, future.result())
+
+    with ThreadPoolExecutor(max_workers=min(len(prompts), _image_workers())) as pool:
+        for prompt_text in prompts:
+            future = pool.submit(_generate_image, _story_visual_prompt(prompt_text))
+            future.add_done_callback(functools.partial(_on_done, prompt_text))
 
-    return {**state, "story_beats": beats}
+    return {"story_beats": beats}
 
 
 def build_graph():
@@ -1365,21 +1839,19 @@ def build_graph():
     graph.add_node("clean_text", clean_text)
     graph.add_node("chunk_text", chunk_text)
     graph.add_node("concept_extraction", concept_extraction)
-    graph.add_node("normalize_concepts", normalize_concepts)
-    graph.add_node("estimate_priority", estimate_priority)
-    graph.add_node("select_scenario_seed", select_scenario_seed)
+    graph.add_node("finalize_concepts", finalize_concepts)
     graph.add_node("generate_learning_event", generate_learning_event)
     graph.add_node("generate_story_visuals", generate_story_visuals)
 
     graph.set_entry_point("store_raw_files")
     graph.add_edge("store_raw_files", "extract_text")
     graph.add_edge("extract_text", "clean_text")
+    # chunk_text and concept_extraction only read cleaned_text, so they run as
+    # parallel branches; both return partial updates to keep their writes disjoint.
     graph.add_edge("clean_text", "chunk_text")
-    graph.add_edge("chunk_text", "concept_extraction")
-    graph.add_edge("concept_extraction", "normalize_concepts")
-    graph.add_edge("normalize_concepts", "estimate_priority")
-    graph.add_edge("estimate_priority", "select_scenario_seed")
-    graph.add_edge("select_scenario_seed", "generate_learning_event")
+    graph.add_edge("clean_text", "concept_extraction")
+    graph.add_edge(["chunk_text", "concept_extraction"], "finalize_concepts")
+    graph.add_edge("finalize_concepts", "generate_learning_event")
     graph.add_edge("generate_learning_event", "generate_story_visuals")
     graph.add_edge("generate_story_visuals", END)
     return graph.compile()
@@ -1394,6 +1866,7 @@ def run_pipeline(raw_files: list, extracted_text: str = "") -> PipelineState:
         "raw_files": raw_files,
         "extracted_text": extracted_text,
         "cleaned_text": "",
+        "cleaned_text_preview": "",
         "chunks": [],
         "concepts": [],
         "normalized_concepts": [],
@@ -1404,6 +1877,7 @@ def run_pipeline(raw_files: list, extracted_text: str = "") -> PipelineState:
         "interactive_story": {},
         "final_storytelling": "",
         "story_beats": [],
+        "story_draft": {},
         "llm_used": False,
         "llm_status": "",
     }
@@ -1433,6 +1907,7 @@ def run_pipeline_with_trace(
         "raw_files": raw_files,
         "extracted_text": extracted_text,
         "cleaned_text": "",
+        "cleaned_text_preview": "",
         "chunks": [],
         "concepts": [],
         "normalized_concepts": [],
@@ -1443,6 +1918,7 @@ def run_pipeline_with_trace(
         "interactive_story": {},
         "final_storytelling": "",
         "story_beats": [],
+        "story_draft": {},
         "llm_used": False,
         "llm_status": "",
     }
@@ -1457,19 +1933,21 @@ def run_pipeline_with_trace(
             if not isinstance(node_update, dict):
                 continue
             current_state.update(node_update)
+            # Preview only what this node changed; earlier entries already hold the
+            # rest, so large fields like cleaned_text are previewed once, not per step.
             trace.append(
                 {
                     "node": node_name,
                     "updated_fields": list(node_update.keys()),
                     "state_preview": {
-                        key: _state_preview_value(current_state.get(key))
-                        for key in current_state.keys()
+                        key: _state_preview_value(value) for key, value in node_update.items()
                     },
                 }
             )
 
-    final_state = PIPELINE_GRAPH.invoke(initial_state)
-    return final_state, trace
+    # The streamed updates already add up to the final state; invoking the graph
+    # again would repeat every LLM and image call.
+    return current_state, trace
 
 
 if __name__ == "__main__":
@@ -1480,4 +1958,4 @@ if __name__ == "__main__":
     Practice free-body diagrams for exam problems.
     """
     result = run_pipeline(["syllabus.pdf", "week1_notes.md"], extracted_text=sample)
-    print(json.dumps(result, indent=2))
+    print(json_dumps(result, indent=True).decode("utf-8"))